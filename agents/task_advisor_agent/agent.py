@@ -34,6 +34,7 @@ def run_task_advisor_tool(
     raw_tasks_str: str,
     available_minutes: int = 60,
     energy_level: str = "medium",
+    dedupe: bool = False,
 ) -> Dict[str, Any]:
     """
     Tool wrapper that runs the full task advisor pipeline.
@@ -42,24 +43,39 @@ def run_task_advisor_tool(
         raw_tasks_str: Task list provided by the user (JSON-like text).
         available_minutes: Time budget for this session.
         energy_level: User's current energy level ("low", "medium", "high").
+        dedupe: Merge near-duplicate tasks (e.g. the same task listed twice
+            with different wording) before planning.
 
     Returns:
         The final plan JSON as a Python dict, including:
         - shortlist
         - nice_to_have
         - summary
+        (LLM usage and the plan_id are left out; usage is logged instead.)
     """
     log_debug(
         f"Calling run_task_advisor with available_minutes={available_minutes}, "
-        f"energy_level={energy_level}"
+        f"energy_level={energy_level}, dedupe={dedupe}"
     )
     plan_json = run_task_advisor(
         tasks=None,
         raw_tasks_str=raw_tasks_str,
         available_minutes=available_minutes,
         energy_level=energy_level,
+        dedupe=dedupe,
     )
     log_debug("Received plan_json from run_task_advisor.")
+
+    # The root agent reads the tool result as input tokens on every turn, so
+    # keep bookkeeping out of it: log the usage summary instead, and drop
+    # plan_id since no re-plan tool is exposed to the agent.
+    usage = plan_json.pop("usage", None)
+    plan_json.pop("plan_id", None)
+    if usage is not None:
+        log_debug(
+            f"LLM usage: {usage['calls']} calls, {usage['prompt_tokens']} prompt / "
+            f"{usage['candidate_tokens']} response tokens, ${usage['cost_usd']:.6f}"
+        )
     return plan_json
 
 
@@ -94,7 +110,8 @@ root_agent = Agent(
                 run_task_advisor_tool(
                 raw_tasks_str = <string form of tasks provided by user>,
                 available_minutes = <integer>,
-                energy_level = <string>
+                energy_level = <string>,
+                dedupe = <true if the list looks like it repeats tasks, else false>
                 )
         - The tool returns a structured JSON plan.
 
@@ -0,0 +1,102 @@
+"""
+Benchmark: task_codec vs. the previous stdlib JSON path.
+
+Compares, on synthetic task lists of increasing size:
+- decoding the parse response (json.loads vs. decode_tasks). decode_tasks
+  also validates every task; with msgspec installed it does so in one typed
+  pass and beats json.loads, without it this row shows the cost of the
+  lenient parse + validate path.
+- encoding plan_data for the planning prompt (json.dumps(indent=2) vs. encode_plan_data)
+- a log_debug call with main.DEBUG off, as in service mode
+  (log_debug(json.dumps(...)) vs. log_debug(lazy_dumps(...)))
+
+    python src/bench_codec.py
+    python src/bench_codec.py --sizes 1000 100000 --repeat 3
+"""
+
+import argparse
+import json
+import random
+import timeit
+
+try:
+    from main import score_tasks, choose_shortlist, assemble_plan_data
+    import main as planner
+    from task_codec import decode_tasks, encode_plan_data, lazy_dumps, msgspec, orjson
+except ImportError:
+    from src.main import score_tasks, choose_shortlist, assemble_plan_data
+    from src import main as planner
+    from src.task_codec import decode_tasks, encode_plan_data, lazy_dumps, msgspec, orjson
+
+
+def make_tasks(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "title": f"Task number {i} about topic {rng.randint(0, 999)}",
+            "importance": rng.randint(1, 3),
+            "urgency": rng.randint(1, 3),
+            "desire": rng.randint(1, 3),
+            "est_minutes": rng.choice([10, 15, 20, 30, 45, 60]),
+        }
+        for i in range(n)
+    ]
+
+
+def _best(fn, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def _row(label: str, old_s: float, new_s: float) -> None:
+    print(f"  {label:<28} stdlib={old_s * 1000:9.2f} ms  codec={new_s * 1000:9.2f} ms  "
+          f"speedup={old_s / new_s if new_s else float('inf'):6.2f}x")
+
+
+def run(sizes, repeat: int) -> None:
+    # The planner's debug prints would dominate the timings.
+    planner.DEBUG = False
+    print(f"orjson available: {orjson is not None}")
+    print(f"msgspec available: {msgspec is not None}")
+
+    for n in sizes:
+        tasks = make_tasks(n)
+        model_text = json.dumps(tasks, indent=2)
+        scored = score_tasks(tasks)
+        plan_data = assemble_plan_data(
+            all_tasks=scored,
+            available_minutes=60,
+            energy_level="medium",
+            suggested_shortlist=choose_shortlist(scored, available_minutes=60),
+        )
+
+        print(f"\n=== {n} tasks ===")
+        _row(
+            "decode (codec validates)",
+            _best(lambda: json.loads(model_text), repeat),
+            _best(lambda: decode_tasks(model_text), repeat),
+        )
+        old_prompt = json.dumps(plan_data, indent=2)
+        new_prompt = encode_plan_data(plan_data)
+        _row(
+            "encode plan_data",
+            _best(lambda: json.dumps(plan_data, indent=2), repeat),
+            _best(lambda: encode_plan_data(plan_data), repeat),
+        )
+        print(f"  {'prompt size (chars)':<28} stdlib={len(old_prompt):>12}  codec={len(new_prompt):>12}")
+        _row(
+            "log_debug, DEBUG off",
+            _best(lambda: planner.log_debug(json.dumps(scored, indent=2)), repeat),
+            _best(lambda: planner.log_debug(lazy_dumps(scored)), repeat),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark task_codec against stdlib json.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Task Deduplication
+
+Imported backlogs often contain near-duplicate titles ("Email accountant",
+"email the accountant re taxes"). This stage runs between parsing and
+score_tasks and merges each cluster of near-duplicates into one
+representative task, so all_tasks, the planning prompt and the shortlist
+only carry each piece of work once.
+
+How it works:
+- Each title is normalized (lowercased, punctuation and filler words
+  dropped) and turned into a set of character 3-gram shingles, so small
+  wording differences ("report" / "reports") still overlap strongly.
+- Numbers and dates ("bug 123", "March", "Fri") are pulled out as
+  discriminators: titles whose discriminators differ are never merged,
+  however similar the rest of the text is.
+- A MinHash signature is computed per title and split into LSH bands. The
+  bucket key includes the discriminators, and each bucket holds at most
+  max_bucket_size cluster representatives. Only the max_candidates
+  representatives sharing the most bands are confirmed with an exact
+  Jaccard check, so the stage stays linear in the number of tasks.
+- A title joins a cluster only if it is similar enough to that cluster's
+  representative (its first title) - never through a chain of pairwise
+  matches - and clusters stop growing at max_cluster_size.
+
+This stage is off by default in run_task_advisor (dedupe=False); the
+threshold errs on the side of keeping distinct tasks apart.
+
+Each cluster becomes one task with aggregated fields (see _merge_cluster),
+and the cluster membership is returned so the final plan can be expanded
+back to the original titles with expand_plan.
+"""
+
+import hashlib
+import re
+import struct
+from collections import Counter
+
+try:
+    from main import log_debug
+except ImportError:
+    from src.main import log_debug
+
+DEFAULT_THRESHOLD = 0.7
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_MAX_BUCKET_SIZE = 8
+DEFAULT_MAX_CLUSTER_SIZE = 16
+DEFAULT_MAX_CANDIDATES = 16
+SHINGLE_SIZE = 3
+
+# Words that don't distinguish one task from another.
+STOPWORDS = frozenset(
+    "a an and about at for from in into of on or re the to with my our your".split()
+)
+
+# Words that DO distinguish otherwise identical tasks ("Pay rent March" vs.
+# "Pay rent April"); treated like numbers.
+DATE_WORDS = frozenset(
+    "january february march april may june july august september october "
+    "november december jan feb mar apr jun jul aug sep sept oct nov dec "
+    "monday tuesday wednesday thursday friday saturday sunday "
+    "mon tue tues wed thu thur thurs fri sat sun".split()
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _is_discriminator(token: str) -> bool:
+    return token in DATE_WORDS or any(c.isdigit() for c in token)
+
+
+def title_features(title: str) -> tuple[frozenset, tuple]:
+    """
+    Normalize a title into (character shingles, discriminator tokens).
+
+    Discriminators are numbers and date words, in title order; two titles
+    can only be duplicates if these match exactly.
+    """
+    tokens = _TOKEN_RE.findall(title.lower())
+    words = [w for w in tokens if w not in STOPWORDS] or tokens
+    discriminators = tuple(w for w in words if _is_discriminator(w))
+    text = " " + (" ".join(words) or title.strip().lower()) + " "
+    n = SHINGLE_SIZE
+    shingles = frozenset(text[i : i + n] for i in range(max(len(text) - n + 1, 1)))
+    return shingles, discriminators
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class MinHasher:
+    """
+    MinHash signatures over title shingles.
+
+    Each shingle is hashed once with SHAKE-128 into num_perm independent
+    32-bit values (cached, since backlogs reuse the same 3-grams constantly);
+    a signature is the element-wise minimum over the title's shingles.
+    """
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM):
+        self.num_perm = num_perm
+        self._unpack = struct.Struct(f"<{num_perm}I").unpack
+        self._cache: dict[str, tuple] = {}
+
+    def _shingle_hashes(self, shingle: str) -> tuple:
+        hashes = self._cache.get(shingle)
+        if hashes is None:
+            digest = hashlib.shake_128(shingle.encode("utf-8")).digest(4 * self.num_perm)
+            hashes = self._cache[shingle] = self._unpack(digest)
+        return hashes
+
+    def signature(self, shingles: frozenset) -> tuple:
+        vectors = [self._shingle_hashes(s) for s in shingles]
+        if len(vectors) == 1:
+            return vectors[0]
+        return tuple(map(min, *vectors))
+
+
+def find_duplicate_clusters(
+    titles: list[str],
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    bands: int = DEFAULT_BANDS,
+    max_bucket_size: int = DEFAULT_MAX_BUCKET_SIZE,
+    max_cluster_size: int = DEFAULT_MAX_CLUSTER_SIZE,
+    max_candidates: int = DEFAULT_MAX_CANDIDATES,
+) -> list[list[int]]:
+    """
+    Group title indexes into clusters of near-duplicates.
+
+    Titles are processed in order; each one either joins the most similar
+    existing cluster whose representative it matches (Jaccard >= threshold,
+    same discriminators, cluster not full) or starts a new cluster.
+
+    Returns a list of clusters (lists of indexes into titles), ordered by
+    the first index in each cluster. Singletons are included.
+    """
+    if num_perm % bands:
+        raise ValueError("num_perm must be divisible by bands.")
+    rows = num_perm // bands
+    band_slices = [slice(b * rows, (b + 1) * rows) for b in range(bands)]
+
+    hasher = MinHasher(num_perm)
+    # One bucket dict per band. A bucket key is (discriminators, that band's
+    # slice of the signature); its value lists representatives of clusters
+    # that still have room.
+    band_buckets: list[dict] = [{} for _ in range(bands)]
+    rep_shingles: dict[int, frozenset] = {}
+    clusters: dict[int, list[int]] = {}
+    rep_keys: dict[int, list] = {}
+    # Identical normalized titles skip LSH and go straight to their cluster.
+    exact_reps: dict[tuple, int] = {}
+
+    def add_member(rep: int, i: int) -> None:
+        clusters[rep].append(i)
+        if len(clusters[rep]) >= max_cluster_size:
+            # Full: stop offering this cluster as a candidate.
+            del rep_shingles[rep]
+            for key, buckets in zip(rep_keys.pop(rep), band_buckets):
+                reps = buckets.get(key)
+                if reps and rep in reps:
+                    reps.remove(rep)
+
+    features = [title_features(title) for title in titles]
+    group_sizes = Counter(discriminators for _, discriminators in features)
+
+    for i, (shingles, discriminators) in enumerate(features):
+        if group_sizes[discriminators] == 1:
+            # Nothing else shares its numbers/dates, so it can't have a duplicate.
+            clusters[i] = [i]
+            continue
+        rep = exact_reps.get((shingles, discriminators))
+        if rep is not None and rep in rep_shingles:
+            add_member(rep, i)
+            continue
+        sig = hasher.signature(shingles)
+        keys = [(discriminators, sig[band_slice]) for band_slice in band_slices]
+
+        # Representatives sharing the most bands are the likeliest matches;
+        # confirm at most max_candidates of them.
+        collisions = Counter()
+        for key, buckets in zip(keys, band_buckets):
+            collisions.update(buckets.get(key, ()))
+
+        best_rep, best_sim = None, threshold
+        for rep, _ in collisions.most_common(max_candidates):
+            other = rep_shingles[rep]
+            # Size alone caps Jaccard at min/max; skip hopeless pairs.
+            if min(len(shingles), len(other)) < best_sim * max(len(shingles), len(other)):
+                continue
+            sim = jaccard(shingles, other)
+            if sim >= best_sim:
+                best_rep, best_sim = rep, sim
+
+        if best_rep is not None:
+            add_member(best_rep, i)
+            continue
+
+        # New cluster: i is its representative.
+        clusters[i] = [i]
+        rep_shingles[i] = shingles
+        rep_keys[i] = keys
+        exact_reps[(shingles, discriminators)] = i
+        for key, buckets in zip(keys, band_buckets):
+            reps = buckets.setdefault(key, [])
+            if len(reps) < max_bucket_size:
+                reps.append(i)
+
+    return list(clusters.values())
+
+
+def _merge_cluster(tasks: list[dict]) -> dict:
+    """
+    Merge near-duplicate tasks into one representative task.
+
+    The most descriptive (longest) title is kept; importance, urgency and
+    desire take the highest value seen, and est_minutes the largest estimate,
+    since duplicates describe the same piece of work rather than extra work.
+    """
+    merged = dict(max(tasks, key=lambda t: len(t["title"])))
+    for field in ("importance", "urgency", "desire", "est_minutes"):
+        merged[field] = max(t[field] for t in tasks)
+    return merged
+
+
+def dedupe_tasks(
+    tasks: list[dict],
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    bands: int = DEFAULT_BANDS,
+    max_bucket_size: int = DEFAULT_MAX_BUCKET_SIZE,
+    max_cluster_size: int = DEFAULT_MAX_CLUSTER_SIZE,
+    max_candidates: int = DEFAULT_MAX_CANDIDATES,
+):
+    """
+    Merge near-duplicate tasks.
+
+    Returns:
+        (deduped_tasks, merged_titles) where merged_titles maps each
+        representative title to the original titles merged into it
+        (only for clusters with more than one task).
+    """
+    clusters = find_duplicate_clusters(
+        [t["title"] for t in tasks],
+        threshold=threshold,
+        num_perm=num_perm,
+        bands=bands,
+        max_bucket_size=max_bucket_size,
+        max_cluster_size=max_cluster_size,
+        max_candidates=max_candidates,
+    )
+
+    deduped = []
+    merged_titles = {}
+    for cluster in clusters:
+        members = [tasks[i] for i in cluster]
+        if len(members) == 1:
+            deduped.append(members[0])
+            continue
+        rep = _merge_cluster(members)
+        deduped.append(rep)
+        merged_titles.setdefault(rep["title"], []).extend(t["title"] for t in members)
+
+    log_debug(
+        f"Deduplicated {len(tasks)} tasks into {len(deduped)} "
+        f"({len(merged_titles)} merged clusters)."
+    )
+    return deduped, merged_titles
+
+
+def expand_plan(plan_json: dict, merged_titles: dict) -> dict:
+    """
+    Attach the original titles to plan entries that stand for a merged cluster.
+
+    Each shortlist / nice_to_have entry whose title is a representative gets
+    a "merged_titles" list. The plan is updated in place and returned.
+    """
+    for section in ("shortlist", "nice_to_have"):
+        for t in plan_json.get(section, []):
+            originals = merged_titles.get(t["title"])
+            if originals:
+                t["merged_titles"] = originals
+    return plan_json
@@ -0,0 +1,230 @@
+"""
+LLM Metrics
+
+Token, cost and latency accounting for every model call.
+
+- timed_generate() wraps client.models.generate_content: it times the call,
+  reads response.usage_metadata and records one LLMCall.
+- REGISTRY aggregates all calls in this process per (stage, model) and
+  exports them as JSON (snapshot) or Prometheus text (to_prometheus).
+- track_usage() collects the calls made while it is active, so a single
+  run_task_advisor request can report its own cost summary.
+
+Prices are USD per 1M tokens and need updating when the provider's
+pricing changes. Unknown models are counted with a cost of 0.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+MODEL_PRICING_USD_PER_1M = {
+    # model: (input, cached input, output)
+    "gemini-2.5-flash-lite": (0.10, 0.025, 0.40),
+    "gemini-2.5-flash": (0.30, 0.075, 2.50),
+}
+
+
+@dataclass
+class LLMCall:
+    stage: str
+    model: str
+    prompt_tokens: int = 0
+    candidate_tokens: int = 0
+    cached_tokens: int = 0
+    latency_s: float = 0.0
+    error: bool = False
+
+    @property
+    def cache_status(self) -> str:
+        return "hit" if self.cached_tokens else "miss"
+
+    @property
+    def cost_usd(self) -> float:
+        input_price, cached_price, output_price = MODEL_PRICING_USD_PER_1M.get(
+            self.model, (0.0, 0.0, 0.0)
+        )
+        uncached = max(self.prompt_tokens - self.cached_tokens, 0)
+        return (
+            uncached * input_price
+            + self.cached_tokens * cached_price
+            + self.candidate_tokens * output_price
+        ) / 1_000_000
+
+
+def summarize_calls(calls: list[LLMCall]) -> dict:
+    """Per-request cost summary: totals plus a breakdown per stage."""
+    by_stage: dict[str, dict] = {}
+    for c in calls:
+        stage = by_stage.setdefault(
+            c.stage,
+            {"calls": 0, "prompt_tokens": 0, "candidate_tokens": 0,
+             "cached_tokens": 0, "latency_s": 0.0, "cost_usd": 0.0},
+        )
+        stage["calls"] += 1
+        stage["prompt_tokens"] += c.prompt_tokens
+        stage["candidate_tokens"] += c.candidate_tokens
+        stage["cached_tokens"] += c.cached_tokens
+        stage["latency_s"] += c.latency_s
+        stage["cost_usd"] += c.cost_usd
+
+    totals = {
+        key: sum(s[key] for s in by_stage.values())
+        for key in ("calls", "prompt_tokens", "candidate_tokens", "cached_tokens",
+                    "latency_s", "cost_usd")
+    }
+    for s in [totals, *by_stage.values()]:
+        # Shares of batched calls can be fractional; report whole tokens.
+        for key in ("prompt_tokens", "candidate_tokens", "cached_tokens"):
+            s[key] = round(s[key])
+        s["latency_s"] = round(s["latency_s"], 4)
+        s["cost_usd"] = round(s["cost_usd"], 8)
+    totals["by_stage"] = by_stage
+    return totals
+
+
+class MetricsRegistry:
+    """Thread-safe, process-wide aggregation of LLM calls per (stage, model)."""
+
+    _FIELDS = ("calls", "errors", "cache_hits", "prompt_tokens", "candidate_tokens",
+               "cached_tokens", "latency_s_sum", "latency_s_max", "cost_usd")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, str], dict] = {}
+
+    def record(self, call: LLMCall) -> None:
+        with self._lock:
+            s = self._series.setdefault(
+                (call.stage, call.model), dict.fromkeys(self._FIELDS, 0)
+            )
+            s["calls"] += 1
+            s["errors"] += call.error
+            s["cache_hits"] += call.cache_status == "hit"
+            s["prompt_tokens"] += call.prompt_tokens
+            s["candidate_tokens"] += call.candidate_tokens
+            s["cached_tokens"] += call.cached_tokens
+            s["latency_s_sum"] += call.latency_s
+            s["latency_s_max"] = max(s["latency_s_max"], call.latency_s)
+            s["cost_usd"] += call.cost_usd
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> list[dict]:
+        """JSON-friendly list of series, most expensive first."""
+        with self._lock:
+            rows = [
+                {"stage": stage, "model": model, **values}
+                for (stage, model), values in self._series.items()
+            ]
+        for r in rows:
+            r["latency_s_sum"] = round(r["latency_s_sum"], 4)
+            r["latency_s_max"] = round(r["latency_s_max"], 4)
+            r["cost_usd"] = round(r["cost_usd"], 8)
+        rows.sort(key=lambda r: r["cost_usd"], reverse=True)
+        return rows
+
+    def to_prometheus(self) -> str:
+        """Render all series in the Prometheus text exposition format."""
+        metrics = [
+            ("task_advisor_llm_calls_total", "counter", "calls", "LLM calls."),
+            ("task_advisor_llm_errors_total", "counter", "errors", "Failed LLM calls."),
+            ("task_advisor_llm_cache_hits_total", "counter", "cache_hits",
+             "LLM calls that reused cached prompt tokens."),
+            ("task_advisor_llm_prompt_tokens_total", "counter", "prompt_tokens",
+             "Prompt tokens sent."),
+            ("task_advisor_llm_candidate_tokens_total", "counter", "candidate_tokens",
+             "Response (candidate) tokens received."),
+            ("task_advisor_llm_cached_tokens_total", "counter", "cached_tokens",
+             "Prompt tokens served from the context cache."),
+            ("task_advisor_llm_latency_seconds_max", "gauge", "latency_s_max",
+             "Slowest LLM call."),
+            ("task_advisor_llm_cost_usd_total", "counter", "cost_usd",
+             "Estimated LLM cost in USD."),
+        ]
+        rows = self.snapshot()
+        lines = []
+        for name, kind, field, help_text in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for r in rows:
+                lines.append(f"{name}{{{_labels(r)}}} {r[field]}")
+
+        # Latency as a summary: _sum and _count (no quantiles are tracked).
+        name = "task_advisor_llm_latency_seconds"
+        lines.append(f"# HELP {name} LLM call latency.")
+        lines.append(f"# TYPE {name} summary")
+        for r in rows:
+            lines.append(f"{name}_sum{{{_labels(r)}}} {r['latency_s_sum']}")
+            lines.append(f"{name}_count{{{_labels(r)}}} {r['calls']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(row: dict) -> str:
+    return f'stage="{row["stage"]}",model="{row["model"]}"'
+
+
+REGISTRY = MetricsRegistry()
+
+_current_calls: contextvars.ContextVar[list | None] = contextvars.ContextVar(
+    "task_advisor_llm_calls", default=None
+)
+
+
+@contextmanager
+def track_usage():
+    """
+    Collect the LLMCalls recorded in this context.
+
+        with track_usage() as calls:
+            ...
+        summary = summarize_calls(calls)
+    """
+    calls: list[LLMCall] = []
+    token = _current_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _current_calls.reset(token)
+
+
+def current_usage() -> list | None:
+    """The list collecting calls for the active track_usage(), or None."""
+    return _current_calls.get()
+
+
+def record_call(call: LLMCall, registry: MetricsRegistry = REGISTRY) -> None:
+    """Add a call to the registry and to the active track_usage() list, if any."""
+    registry.record(call)
+    calls = _current_calls.get()
+    if calls is not None:
+        calls.append(call)
+
+
+def timed_generate(client, model: str, contents, stage: str):
+    """
+    Call client.models.generate_content and record its usage and latency.
+
+    Failed calls are recorded (with error=True) and the exception re-raised.
+    """
+    call = LLMCall(stage=stage, model=model)
+    start = time.perf_counter()
+    try:
+        response = client.models.generate_content(model=model, contents=contents)
+    except Exception:
+        call.error = True
+        raise
+    else:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            call.prompt_tokens = usage.prompt_token_count or 0
+            call.candidate_tokens = usage.candidates_token_count or 0
+            call.cached_tokens = getattr(usage, "cached_content_token_count", None) or 0
+        return response
+    finally:
+        call.latency_s = time.perf_counter() - start
+        record_call(call)
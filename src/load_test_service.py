@@ -0,0 +1,202 @@
+"""
+Load test for the Task Advisor Service.
+
+Starts the service in-process on an ephemeral port with a stub LLM client
+(no API key, no network), fires concurrent /advise requests at it and
+reports throughput and latency percentiles, followed by the service's own
+/metrics output.
+
+    python src/load_test_service.py --requests 200 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+try:
+    from task_advisor_service import TaskAdvisorService
+    from parse_batcher import ParseBatcher
+    import main as planner
+    import parse_tasks_agent
+    import plan_explainer_agent
+except ImportError:
+    from src.task_advisor_service import TaskAdvisorService
+    from src.parse_batcher import ParseBatcher
+    from src import main as planner
+    from src import parse_tasks_agent
+    from src import plan_explainer_agent
+
+DEMO_RAW_TASKS = json.dumps(
+    [
+        {"title": "Email accountant", "importance": 3, "urgency": 3, "est_minutes": 20},
+        {"title": "Go for a walk", "importance": 2, "urgency": 2},
+        {"title": "Practice mandolin", "desire": 3, "est_minutes": 30},
+    ]
+)
+
+
+def _normalize(raw_tasks: list) -> list:
+    return [
+        {
+            "title": t.get("title", "Untitled"),
+            "importance": t.get("importance", 2),
+            "urgency": t.get("urgency", 2),
+            "desire": t.get("desire", 2),
+            "est_minutes": t.get("est_minutes", 30),
+        }
+        for t in raw_tasks
+    ]
+
+
+class _StubUsage:
+    def __init__(self, prompt: str, text: str):
+        # Rough 4-characters-per-token estimate.
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+        self.cached_content_token_count = 0
+
+
+class _StubResponse:
+    def __init__(self, text: str, prompt: str = ""):
+        self.text = text
+        self.usage_metadata = _StubUsage(prompt, text)
+
+
+class _StubModels:
+    """Answers parse, batched parse and planning prompts without a real model."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def generate_content(self, model, contents):
+        self.calls += 1
+        time.sleep(self.latency_s)
+        prompt = contents if isinstance(contents, str) else contents[0]["parts"][0]["text"]
+
+        if "PLAN_DATA_JSON:" in prompt:
+            plan_data = json.loads(prompt.split("PLAN_DATA_JSON:", 1)[1])
+            shortlist = [
+                {
+                    "title": t["title"],
+                    "reason": "Stub: deterministic pick.",
+                    "est_minutes": t["est_minutes"],
+                    "score": t["score"],
+                }
+                for t in plan_data.get("suggested_shortlist", [])
+            ]
+            return _StubResponse(
+                json.dumps({"shortlist": shortlist, "nice_to_have": [], "summary": "Stub plan."}),
+                prompt,
+            )
+
+        if "DOCUMENTS_JSON:" in prompt:
+            documents = json.loads(prompt.split("DOCUMENTS_JSON:", 1)[1])
+            return _StubResponse(
+                json.dumps({i: _normalize(json.loads(raw)) for i, raw in documents.items()}),
+                prompt,
+            )
+
+        raw = prompt.split("Here is the raw task input:", 1)[1]
+        return _StubResponse(json.dumps(_normalize(json.loads(raw))), prompt)
+
+
+class StubGenaiClient:
+    def __init__(self, latency_s: float = 0.05):
+        self.models = _StubModels(latency_s)
+
+
+async def _post_advise(host: str, port: int, payload: dict) -> tuple[int, float]:
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        (
+            "POST /advise HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        ).encode("ascii")
+        + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status = int(response.split(b" ", 2)[1])
+    return status, time.perf_counter() - start
+
+
+async def _get_json(host: str, port: int, path: str) -> dict:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("ascii"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def run_load_test(args) -> None:
+    planner.DEBUG = args.debug
+    stub = StubGenaiClient(latency_s=args.llm_latency)
+    parse_tasks_agent._client = stub
+    plan_explainer_agent._client = stub
+
+    service = TaskAdvisorService(
+        workers=args.workers,
+        cpu_workers=args.cpu_workers,
+        parse_batcher=ParseBatcher(
+            batch_window_s=args.batch_window, max_batch_size=args.batch_size
+        ),
+    )
+    service.warm_up()
+    server = await service.start(host="127.0.0.1", port=0)
+    host, port = server.sockets[0].getsockname()[:2]
+
+    payload = {
+        "raw_tasks_str": DEMO_RAW_TASKS,
+        "available_minutes": 60,
+        "energy_level": "medium",
+    }
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_request():
+        async with semaphore:
+            return await _post_advise(host, port, payload)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one_request() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    failures = sum(1 for status, _ in results if status != 200)
+    metrics = await _get_json(host, port, "/metrics")
+    await service.drain()
+
+    print("\n=== Load Test Results ===")
+    print(f"Requests:     {args.requests} (concurrency={args.concurrency})")
+    print(f"Failures:     {failures}")
+    print(f"Elapsed:      {elapsed:.2f} s ({args.requests / elapsed:.1f} req/s)")
+    print(f"Latency p50:  {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"Latency p95:  {latencies[int(0.95 * (len(latencies) - 1))] * 1000:.1f} ms")
+    print(f"LLM calls:    {stub.models.calls}")
+    print("\n=== Service /metrics ===")
+    print(json.dumps(metrics, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Task Advisor Service against a stub LLM.")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--cpu-workers", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated seconds per LLM call.")
+    parser.add_argument("--debug", action="store_true", help="Print per-request debug output.")
+    parser.add_argument("--batch-window", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=8)
+    asyncio.run(run_load_test(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
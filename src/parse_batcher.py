@@ -0,0 +1,213 @@
+"""
+Parse Batcher
+
+Collects parse requests from concurrent callers (e.g. several users hitting
+the advisor at once) and normalizes them together in one multi-document
+LLM call, so the Parse Tasks Agent instruction is sent once per batch
+instead of once per user.
+
+- A batch is flushed when it reaches max_batch_size, or batch_window_s
+  seconds after its first request arrived, whichever comes first.
+- Batches always run off the submitting thread (on the timer thread, or on
+  a short-lived worker thread when a submit fills the batch), so submit()
+  returns its Future immediately.
+- Results are demultiplexed back to each caller.
+- Errors are isolated per document: a document the batch response could not
+  account for is retried on its own via call_parse_tasks_agent (concurrently
+  with the batch's other retries), and only that caller sees an exception if
+  the retry also fails. If the batch call itself fails (network, quota, ...),
+  every caller gets that exception without further calls.
+- LLM usage of a shared batch call is split evenly across the callers'
+  track_usage() summaries; per-document retries are charged to their caller.
+"""
+
+import threading
+from concurrent.futures import Future
+from dataclasses import replace
+
+try:
+    from parse_tasks_agent import (
+        call_parse_tasks_agent,
+        call_parse_tasks_agent_batch,
+        log_debug,
+    )
+    from llm_metrics import track_usage, current_usage
+except ImportError:
+    from src.parse_tasks_agent import (
+        call_parse_tasks_agent,
+        call_parse_tasks_agent_batch,
+        log_debug,
+    )
+    from src.llm_metrics import track_usage, current_usage
+
+DEFAULT_BATCH_WINDOW_S = 0.05
+DEFAULT_MAX_BATCH_SIZE = 8
+
+
+class ParseBatcher:
+    """
+    Thread-safe micro-batcher in front of the Parse Tasks Agent.
+
+    Usage:
+        batcher = ParseBatcher(batch_window_s=0.05, max_batch_size=8)
+        tasks = batcher.parse(raw_tasks_str)   # blocks until its batch is done
+
+    batch_fn / single_fn default to the real LLM calls and can be swapped
+    (e.g. for a stub model when load testing).
+    """
+
+    def __init__(
+        self,
+        batch_window_s: float = DEFAULT_BATCH_WINDOW_S,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        batch_fn=call_parse_tasks_agent_batch,
+        single_fn=call_parse_tasks_agent,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.batch_window_s = batch_window_s
+        self.max_batch_size = max_batch_size
+        self._batch_fn = batch_fn
+        self._single_fn = single_fn
+        self._lock = threading.Lock()
+        # (raw_tasks_str, future, caller's track_usage() list or None)
+        self._pending: list[tuple[str, Future, list | None]] = []
+        self._timer: threading.Timer | None = None
+
+    def submit(self, raw_tasks_str: str) -> Future:
+        """Queue a raw task string and return a Future for its task list."""
+        future = Future()
+        with self._lock:
+            self._pending.append((raw_tasks_str, future, current_usage()))
+            if len(self._pending) >= self.max_batch_size:
+                # Full batch: hand it to a worker thread, like the timer path,
+                # rather than running the LLM call on the caller's thread.
+                worker = threading.Thread(
+                    target=self._run_batch, args=(self._take_pending(),), daemon=True
+                )
+                worker.start()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.batch_window_s, self._flush_due)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def parse(self, raw_tasks_str: str, timeout: float | None = None):
+        """Blocking convenience wrapper: same contract as call_parse_tasks_agent."""
+        return self.submit(raw_tasks_str).result(timeout=timeout)
+
+    def flush(self) -> None:
+        """Run whatever is pending right now, without waiting for the window."""
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._run_batch(batch)
+
+    def _take_pending(self) -> list[tuple[str, Future, list | None]]:
+        """Detach the pending batch. Caller must hold self._lock."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _flush_due(self) -> None:
+        with self._lock:
+            self._timer = None
+            batch = self._take_pending()
+        if batch:
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: list[tuple[str, Future, list | None]]) -> None:
+        try:
+            self._run_batch_unchecked(batch)
+        finally:
+            # Never leave a caller waiting on a future nobody will settle.
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(
+                        RuntimeError("Parse batch ended without a result for this document.")
+                    )
+
+    def _run_batch_unchecked(self, batch: list[tuple[str, Future, list | None]]) -> None:
+        raw_strs = [raw for raw, _, _ in batch]
+        log_debug(f"[ParseBatcher] Flushing batch of {len(batch)} documents.")
+
+        if len(batch) == 1:
+            raw, future, usage = batch[0]
+            self._settle(future, self._parse_single(raw, usage))
+            return
+
+        with track_usage() as batch_calls:
+            try:
+                results = self._batch_fn(raw_strs)
+            except Exception as e:
+                # The whole call failed (network, quota, ...). That is not a
+                # problem with any one document, and retrying each of them
+                # would only multiply calls against a failing upstream.
+                log_debug(f"[ParseBatcher] Batch call failed: {e!r}")
+                results = None
+                for _, future, _ in batch:
+                    future.set_exception(e)
+
+        for raw, future, usage in batch:
+            if usage is not None:
+                usage.extend(_share_of(call, len(batch)) for call in batch_calls)
+        if results is None:
+            return
+
+        if len(results) != len(batch):
+            # Results can't be matched to documents; retry each one alone.
+            log_debug(
+                f"[ParseBatcher] Batch returned {len(results)} results for "
+                f"{len(batch)} documents."
+            )
+            results = [
+                ValueError("Batch result count did not match document count.")
+            ] * len(batch)
+
+        # Documents the response couldn't account for are retried alone, all
+        # at once, so a caller doesn't wait for other callers' retries.
+        retries = []
+        for (raw, future, usage), result in zip(batch, results):
+            if isinstance(result, Exception):
+                log_debug(f"[ParseBatcher] Retrying document alone: {result}")
+                retry = threading.Thread(
+                    target=self._retry_single, args=(raw, future, usage), daemon=True
+                )
+                retry.start()
+                retries.append(retry)
+            else:
+                self._settle(future, result)
+        for retry in retries:
+            retry.join()
+
+    def _retry_single(self, raw_tasks_str: str, future: Future, usage: list | None) -> None:
+        self._settle(future, self._parse_single(raw_tasks_str, usage))
+
+    def _parse_single(self, raw_tasks_str: str, usage: list | None):
+        with track_usage() as calls:
+            try:
+                result = self._single_fn(raw_tasks_str)
+            except Exception as e:
+                result = e
+        if usage is not None:
+            usage.extend(calls)
+        return result
+
+    @staticmethod
+    def _settle(future: Future, result) -> None:
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+
+def _share_of(call, n: int):
+    """One caller's even share of a batched LLM call's tokens."""
+    return replace(
+        call,
+        prompt_tokens=call.prompt_tokens / n,
+        candidate_tokens=call.candidate_tokens / n,
+        cached_tokens=call.cached_tokens / n,
+    )
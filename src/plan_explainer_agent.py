@@ -10,8 +10,6 @@ Agent is the root agent in `agents/task_advisor_agent/agent.py`, which calls
 this module as a tool.
 """
 
-import json
-from pprint import pformat
 import os
 
 from dotenv import load_dotenv
@@ -27,6 +25,8 @@ try:
         log_debug,
         DEBUG,
     )
+    from task_codec import decode_plan, encode_plan_data, lazy_dumps
+    from llm_metrics import timed_generate
 except ImportError:
     from src.main import (
         SAMPLE_TASKS,
@@ -36,6 +36,8 @@ except ImportError:
         log_debug,
         DEBUG,
     )
+    from src.task_codec import decode_plan, encode_plan_data, lazy_dumps
+    from src.llm_metrics import timed_generate
 
 MODEL_NAME = "gemini-2.5-flash-lite"
 
@@ -96,30 +98,11 @@ def build_demo_plan_data() -> dict:
         energy_level="medium",
         suggested_shortlist=suggested_shortlist,
     )
-    log_debug(
-        "Plan data assembled in plan_explainer_agent:\n" + pformat(plan_data, indent=2)
-    )
+    log_debug("Plan data assembled in plan_explainer_agent:")
+    log_debug(lazy_dumps(plan_data))
     return plan_data
 
 
-def _strip_markdown_fences(raw_text: str) -> str:
-    """
-    Remove accidental ```json ... ``` or ``` ... ``` fences around the JSON.
-    The instructions explicitly tell the model not to use fences, but
-    this is a safety net.
-    """
-    text = raw_text.strip()
-    if text.startswith("```"):
-        # Drop the first line (``` or ```json)
-        first_newline = text.find("\n")
-        if first_newline != -1:
-            text = text[first_newline + 1 :]
-        # Drop trailing ```
-        if text.strip().endswith("```"):
-            text = text.rsplit("```", 1)[0]
-    return text.strip()
-
-
 def call_planning_agent(plan_data: dict) -> dict:
     """
     Send plan_data to the planning LLM (Gemini) and return the parsed JSON result.
@@ -135,74 +118,67 @@ def call_planning_agent(plan_data: dict) -> dict:
         + "\n\nHere is the current plan data as JSON.\n"
         + "Use it to construct your JSON response as described in the instructions.\n\n"
         + "PLAN_DATA_JSON:\n"
-        + json.dumps(plan_data, indent=2)
+        + encode_plan_data(plan_data)
     )
 
     log_debug("[User → Model]")
     log_debug(user_prompt)
 
     client = get_client()
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=user_prompt,
-    )
+    response = timed_generate(client, MODEL_NAME, user_prompt, stage="plan")
 
     raw_text = (response.text or "").strip()
     log_debug("[Model Explanation]")
     log_debug(raw_text)
 
-    cleaned = _strip_markdown_fences(raw_text)
-
-    # Try to parse the JSON. If it fails, log and re-raise for visibility.
+    # Parse and validate in one pass. If it fails, log and re-raise for visibility.
     try:
-        plan_json = json.loads(cleaned)
-    except json.JSONDecodeError as e:
-        log_debug("ERROR: Failed to parse JSON from model response.")
-        log_debug(f"Raw cleaned text was:\n{cleaned}")
+        plan_json = decode_plan(raw_text)
+    except ValueError as e:
+        log_debug(f"ERROR: Failed to decode plan from model response: {e}")
+        log_debug(f"Raw text was:\n{raw_text}")
         raise e
 
     log_debug("[Parsed JSON Plan]")
-    log_debug(json.dumps(plan_json, indent=2))
+    log_debug(lazy_dumps(plan_json))
     return plan_json
 
 
+def _print_plan_tasks(tasks) -> None:
+    for t in tasks:
+        print(f"- {t['title']} [{t['est_minutes']} min, score={t['score']}]")
+        print(f"  Reason: {t['reason']}")
+        if "merged_titles" in t:
+            print(f"  Covers: {'; '.join(t['merged_titles'])}")
+
+
 def print_final_plan(plan_json: dict) -> None:
-    """Pretty-print the final plan for CLI usage and debugging."""
+    """
+    Pretty-print the final plan for CLI usage and debugging.
+
+    Expects a plan decoded by task_codec.decode_plan, so every field is present.
+    """
+    shortlist = plan_json["shortlist"]
     print("\nShortlist tasks chosen by the agent:")
-    for t in plan_json.get("shortlist", []):
-        print(
-            f"- {t.get('title')} "
-            f"(est={t.get('est_minutes')} min, score={t.get('score')})"
-        )
+    for t in shortlist:
+        print(f"- {t['title']} (est={t['est_minutes']} min, score={t['score']})")
 
     print("\n\n=== Final Task Plan ===")
 
     # Shortlist section
     print("\nShortlist (focus tasks):")
-    for t in plan_json.get("shortlist", []):
-        title = t.get("title")
-        est = t.get("est_minutes")
-        score = t.get("score")
-        reason = t.get("reason")
-        print(f"- {title} [{est} min, score={score}]")
-        print(f"  Reason: {reason}")
+    _print_plan_tasks(shortlist)
 
     # Nice-to-have section
-    nice_to_have = plan_json.get("nice_to_have", [])
+    nice_to_have = plan_json["nice_to_have"]
     if nice_to_have:
         print("\nNice-to-have tasks (optional):")
-        for t in nice_to_have:
-            title = t.get("title")
-            est = t.get("est_minutes")
-            score = t.get("score")
-            reason = t.get("reason")
-            print(f"- {title} [{est} min, score={score}]")
-            print(f"  Reason: {reason}")
+        _print_plan_tasks(nice_to_have)
     else:
         print("\nNo nice-to-have tasks suggested for this session.")
 
     # Summary
-    summary = plan_json.get("summary")
+    summary = plan_json["summary"]
     if summary:
         print("\nSummary:")
         print(summary)
@@ -0,0 +1,291 @@
+"""
+Incremental Re-planning
+
+When a user finishes or abandons shortlist items mid-session, re-running
+run_task_advisor from scratch means parsing, scoring and two LLM calls
+again. replan_task_advisor instead patches the previous plan locally:
+
+- Every plan carries a "plan_id". The scored task list behind it is kept
+  server-side in PLAN_STORE (a bounded, in-process LRU), so clients only
+  send the id back, never the task list.
+- Tasks marked completed or skipped are dropped from that scored list, so
+  nothing is re-parsed or re-scored. Original titles of merged duplicates
+  are resolved to the task that represents them.
+- The agent's remaining shortlist entries are kept if they still fit the
+  time budget.
+- choose_shortlist is re-run on the remaining tasks and the remaining time
+  and compared with the deterministic shortlist the previous plan was built
+  from; tasks the agent already placed (shortlist or nice_to_have) don't
+  count as new, so slack the agent left on purpose never triggers a call.
+- Only if that shows a material change (tasks that no longer fit, or tasks
+  that should now be added) is the planning agent called again. Otherwise
+  the patched plan is returned without any LLM call: nice_to_have entries
+  that no longer fit are dropped, and the agent's summary gets an
+  "Updated: ..." note of what was done and how much time is left.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+
+try:
+    from main import choose_shortlist, assemble_plan_data, log_debug
+    from plan_explainer_agent import call_planning_agent, print_final_plan
+    from dedup_tasks import expand_plan
+    from llm_metrics import track_usage, summarize_calls
+except ImportError:
+    from src.main import choose_shortlist, assemble_plan_data, log_debug
+    from src.plan_explainer_agent import call_planning_agent, print_final_plan
+    from src.dedup_tasks import expand_plan
+    from src.llm_metrics import track_usage, summarize_calls
+
+# Number of shortlist tasks that must be added or dropped before the
+# planning agent is asked for a fresh plan.
+DEFAULT_MATERIAL_CHANGE = 1
+
+# How many plans PLAN_STORE keeps available for re-planning.
+DEFAULT_MAX_PLANS = 256
+
+
+def _key(title: str) -> str:
+    return title.strip().casefold()
+
+
+class PlanStore:
+    """
+    Thread-safe LRU of re-planning state, keyed by plan_id.
+
+    Only the most recent max_plans plans can be re-planned; older ids are
+    evicted and replan_task_advisor rejects them.
+    """
+
+    def __init__(self, max_plans: int = DEFAULT_MAX_PLANS):
+        self.max_plans = max_plans
+        self._lock = threading.Lock()
+        self._states: OrderedDict[str, dict] = OrderedDict()
+
+    def save(self, state: dict) -> str:
+        plan_id = uuid.uuid4().hex
+        with self._lock:
+            self._states[plan_id] = state
+            while len(self._states) > self.max_plans:
+                self._states.popitem(last=False)
+        return plan_id
+
+    def get(self, plan_id: str) -> dict | None:
+        with self._lock:
+            state = self._states.get(plan_id)
+            if state is not None:
+                self._states.move_to_end(plan_id)
+            return state
+
+    def __contains__(self, plan_id) -> bool:
+        with self._lock:
+            return plan_id in self._states
+
+
+PLAN_STORE = PlanStore()
+
+
+def remember_plan(
+    plan_json,
+    all_tasks,
+    energy_level,
+    merged_titles,
+    suggested_shortlist,
+    store=PLAN_STORE,
+    summary=None,
+    completed=(),
+    skipped=(),
+) -> str:
+    """
+    Save what a later re-plan needs and tag plan_json with its "plan_id".
+
+    suggested_shortlist is the deterministic shortlist the plan was based on,
+    so a re-plan can tell real changes from slack the agent left on purpose.
+    summary / completed / skipped are the agent-written summary and the
+    titles finished or skipped since it was written (defaults: the plan's
+    own summary, nothing done yet).
+    """
+    plan_json["plan_id"] = store.save(
+        {
+            "all_tasks": all_tasks,
+            "energy_level": energy_level,
+            "merged_titles": merged_titles,
+            "suggested_keys": {_key(t["title"]) for t in suggested_shortlist},
+            "shortlist": plan_json.get("shortlist", []),
+            "nice_to_have": plan_json.get("nice_to_have", []),
+            "summary": plan_json.get("summary", "") if summary is None else summary,
+            "completed": list(completed),
+            "skipped": list(skipped),
+        }
+    )
+    return plan_json["plan_id"]
+
+
+def _resolve_titles(titles, merged_titles) -> set:
+    """Keys of the tasks the given titles refer to, mapping merged originals
+    to the title of the task that represents them."""
+    representative = {
+        _key(original): rep
+        for rep, originals in merged_titles.items()
+        for original in originals
+    }
+    return {_key(representative.get(_key(t), t)) for t in titles}
+
+
+def patch_shortlist(state, remaining_tasks, available_minutes):
+    """
+    Patch the previous plan's shortlist against the remaining tasks and time.
+
+    Returns:
+        (kept, dropped, added, suggested) where kept are previous shortlist
+        entries that still fit in order, dropped are previous entries that
+        no longer fit, suggested is a fresh choose_shortlist run over the
+        remaining tasks and time, and added are the tasks in it that the
+        previous plan didn't already account for (neither suggested before,
+        nor on the agent's shortlist or nice_to_have). With unchanged inputs
+        dropped and added are both empty, whatever slack the agent left.
+    """
+    remaining_keys = {_key(t["title"]) for t in remaining_tasks}
+
+    kept, dropped = [], []
+    budget = available_minutes
+    for entry in state["shortlist"]:
+        if _key(entry["title"]) not in remaining_keys:
+            continue
+        if entry["est_minutes"] <= budget:
+            kept.append(entry)
+            budget -= entry["est_minutes"]
+        else:
+            dropped.append(entry)
+
+    known_keys = (
+        state["suggested_keys"]
+        | {_key(t["title"]) for t in kept}
+        | {_key(t["title"]) for t in state["nice_to_have"]}
+    )
+    suggested = choose_shortlist(remaining_tasks, available_minutes=available_minutes)
+    added = [t for t in suggested if _key(t["title"]) not in known_keys]
+    return kept, dropped, added, suggested
+
+
+def _updated_summary(summary, completed, skipped, available_minutes) -> str:
+    """The agent's summary plus a note of what changed since it was written."""
+    parts = []
+    if completed:
+        parts.append(f"{', '.join(completed)} done")
+    if skipped:
+        parts.append(f"{', '.join(skipped)} skipped")
+    parts.append(f"{available_minutes} min left")
+    note = "Updated: " + "; ".join(parts) + "."
+    return f"{summary}\n\n{note}" if summary else note
+
+
+def replan_task_advisor(
+    plan_id,
+    completed_titles=(),
+    skipped_titles=(),
+    available_minutes=None,
+    energy_level=None,
+    material_change=DEFAULT_MATERIAL_CHANGE,
+    print_plan=True,
+    store=PLAN_STORE,
+):
+    """
+    Re-plan after some tasks were completed or skipped.
+
+    Parameters:
+        plan_id: "plan_id" of a plan returned by run_task_advisor (or by a
+            previous replan_task_advisor call); the plan itself is accepted too
+        completed_titles: titles of tasks the user finished
+        skipped_titles: titles of tasks the user abandoned for this session
+        available_minutes: minutes left in the session
+        energy_level: optional new energy level (defaults to the previous one)
+        material_change: how many shortlist tasks must be added or dropped
+            before the planning agent is called again
+        print_plan: pretty-print the resulting plan
+        store: PlanStore holding the previous plan's state
+
+    Returns:
+        A new plan JSON with its own "plan_id". Its "replan" entry records
+        whether the planning agent was called; "usage" covers only this
+        re-plan.
+    """
+    if isinstance(plan_id, dict):
+        plan_id = plan_id.get("plan_id")
+    state = store.get(plan_id) if isinstance(plan_id, str) else None
+    if state is None:
+        raise ValueError(
+            f"Unknown or expired plan_id {plan_id!r}; pass the plan_id of a recent plan."
+        )
+    if available_minutes is None:
+        raise ValueError("available_minutes (minutes remaining) is required.")
+    energy_level = energy_level or state["energy_level"]
+    merged_titles = state["merged_titles"]
+
+    removed = _resolve_titles((*completed_titles, *skipped_titles), merged_titles)
+    remaining_tasks = [t for t in state["all_tasks"] if _key(t["title"]) not in removed]
+
+    with track_usage() as llm_calls:
+        kept, dropped, added, suggested = patch_shortlist(
+            state, remaining_tasks, available_minutes
+        )
+        changed = len(dropped) + len(added)
+        log_debug(
+            f"Re-plan: kept {len(kept)}, dropped {len(dropped)}, "
+            f"would add {len(added)} shortlist tasks."
+        )
+
+        if changed >= material_change:
+            log_debug("Shortlist changed materially; calling planning agent...")
+            plan_data = assemble_plan_data(
+                all_tasks=remaining_tasks,
+                available_minutes=available_minutes,
+                energy_level=energy_level,
+                suggested_shortlist=suggested,
+            )
+            plan_json = call_planning_agent(plan_data)
+            expand_plan(plan_json, merged_titles)
+            # Fresh summary: nothing done since it was written.
+            summary, completed, skipped = None, [], []
+        else:
+            log_debug("Shortlist unchanged; patching previous plan locally.")
+            budget = available_minutes - sum(t["est_minutes"] for t in kept)
+            summary = state["summary"]
+            completed = state["completed"] + list(completed_titles)
+            skipped = state["skipped"] + list(skipped_titles)
+            plan_json = {
+                "shortlist": kept,
+                # Only extras that still fit in the time the shortlist leaves.
+                "nice_to_have": [
+                    t for t in state["nice_to_have"]
+                    if _key(t["title"]) not in removed and t["est_minutes"] <= budget
+                ],
+                "summary": _updated_summary(summary, completed, skipped, available_minutes),
+            }
+
+    plan_json["replan"] = {
+        "llm_called": changed >= material_change,
+        "completed": list(completed_titles),
+        "skipped": list(skipped_titles),
+        "available_minutes": available_minutes,
+        "dropped": [t["title"] for t in dropped],
+        "added": [t["title"] for t in added],
+    }
+    plan_json["usage"] = summarize_calls(llm_calls)
+    remember_plan(
+        plan_json,
+        remaining_tasks,
+        energy_level,
+        merged_titles,
+        suggested,
+        store=store,
+        summary=summary,
+        completed=completed,
+        skipped=skipped,
+    )
+
+    if print_plan:
+        print_final_plan(plan_json)
+    return plan_json
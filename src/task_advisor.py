@@ -16,47 +16,49 @@ from dotenv import load_dotenv
 import os
 
 def log_debug(msg: str):
-    print(f"==== {msg}")
+    """Print debug messages only when the master DEBUG flag (main.DEBUG) is on."""
+    if planner.DEBUG:
+        print(f"==== {msg}")
 
 try:
     # Script-style import (when running: python src/task_advisor.py)
     from main import SAMPLE_TASKS, score_tasks, choose_shortlist, assemble_plan_data
     from plan_explainer_agent import call_planning_agent, print_final_plan
     from parse_tasks_agent import call_parse_tasks_agent
+    from dedup_tasks import dedupe_tasks, expand_plan
+    from llm_metrics import track_usage, summarize_calls
+    from replan import remember_plan
+    import main as planner
 except ImportError:
     # Package-style import (when imported as src.task_advisor)
     from src.main import SAMPLE_TASKS, score_tasks, choose_shortlist, assemble_plan_data
     from src.plan_explainer_agent import call_planning_agent, print_final_plan
     from src.parse_tasks_agent import call_parse_tasks_agent
+    from src.dedup_tasks import dedupe_tasks, expand_plan
+    from src.llm_metrics import track_usage, summarize_calls
+    from src.replan import remember_plan
+    from src import main as planner
 
+# Below this many tasks (or without dedupe) the deterministic stages run
+# inline even when a pool is given: pickling the tasks out and the scored
+# plan_data back costs more than the stages themselves.
+DETERMINISTIC_POOL_MIN_TASKS = 10_000
 
-def run_task_advisor(
-    tasks=None,
-    raw_tasks_str=None,
-    available_minutes=60,
-    energy_level="medium"
-):
-    """
-    Root orchestrator for the Task Advisor (Python-level).
-    This will later be replaced or wrapped by the ADK root agent.
 
-    Parameters:
-        tasks: list of task dicts (optional)
-        raw_tasks_str: string containing raw task input (reserved for Step 3)
-        available_minutes: int
-        energy_level: str
+def prepare_plan_data(tasks, available_minutes, energy_level, dedupe=False):
     """
+    Deterministic part of the pipeline: dedupe, score, shortlist, assemble.
 
-    # Phase 1-Step 4: 
-    # If no tasks provided, use SAMPLE_TASKS. But if raw_tasks_str is provided, 
-    # use the Parse Tasks Agent to normalize it.
-    if tasks is None:
-        if raw_tasks_str is not None:
-            # Use the Parse Tasks Agent to normalize the raw input
-            tasks = call_parse_tasks_agent(raw_tasks_str)
-        else:
-            # Fallback to built-in sample tasks
-            tasks = SAMPLE_TASKS
+    Kept as a plain module-level function so it can be sent to a process
+    pool (see run_task_advisor's deterministic_pool).
+
+    Returns:
+        (plan_data, merged_titles)
+    """
+    merged_titles = {}
+    if dedupe:
+        log_debug("Merging near-duplicate tasks...")
+        tasks, merged_titles = dedupe_tasks(tasks)
 
     log_debug("Scoring tasks...")
     # ---- Step A: Score tasks (deterministic) ----
@@ -74,14 +76,96 @@ def run_task_advisor(
         energy_level=energy_level,
         suggested_shortlist=shortlist,
     )
+    return plan_data, merged_titles
+
+
+def run_task_advisor(
+    tasks=None,
+    raw_tasks_str=None,
+    available_minutes=60,
+    energy_level="medium",
+    parse_batcher=None,
+    print_plan=True,
+    dedupe=False,
+    deterministic_pool=None,
+):
+    """
+    Root orchestrator for the Task Advisor (Python-level).
+    This will later be replaced or wrapped by the ADK root agent.
+
+    Parameters:
+        tasks: list of task dicts (optional)
+        raw_tasks_str: string containing raw task input (reserved for Step 3)
+        available_minutes: int
+        energy_level: str
+        parse_batcher: optional ParseBatcher; when given, raw_tasks_str is
+            normalized together with other concurrent callers' input
+        print_plan: pretty-print the final plan (disable when serving)
+        dedupe: merge near-duplicate tasks before scoring (off by default);
+            merged plan entries get a "merged_titles" list of the original titles
+        deterministic_pool: optional concurrent.futures executor (e.g. a
+            ProcessPoolExecutor) for the deterministic stages; only used with
+            dedupe on and at least DETERMINISTIC_POOL_MIN_TASKS tasks
+
+    The returned plan JSON carries a "usage" entry summarizing the tokens,
+    latency and estimated cost of every LLM call made for this request, and
+    a "plan_id" to pass to replan.replan_task_advisor (the scored tasks
+    behind it stay server-side in replan.PLAN_STORE).
+    """
+    with track_usage() as llm_calls:
+        # Phase 1-Step 4: 
+        # If no tasks provided, use SAMPLE_TASKS. But if raw_tasks_str is provided, 
+        # use the Parse Tasks Agent to normalize it.
+        if tasks is None:
+            if raw_tasks_str is not None:
+                # Use the Parse Tasks Agent to normalize the raw input
+                if parse_batcher is not None:
+                    tasks = parse_batcher.parse(raw_tasks_str)
+                else:
+                    tasks = call_parse_tasks_agent(raw_tasks_str)
+            else:
+                # Fallback to built-in sample tasks
+                tasks = SAMPLE_TASKS
+
+        # ---- Steps A-C: deterministic stages (optionally in a process pool) ----
+        use_pool = (
+            deterministic_pool is not None
+            and dedupe
+            and len(tasks) >= DETERMINISTIC_POOL_MIN_TASKS
+        )
+        if use_pool:
+            plan_data, merged_titles = deterministic_pool.submit(
+                prepare_plan_data, tasks, available_minutes, energy_level, dedupe
+            ).result()
+        else:
+            plan_data, merged_titles = prepare_plan_data(
+                tasks, available_minutes, energy_level, dedupe
+            )
+        scored = plan_data["all_tasks"]
+
+        log_debug("Calling planning agent...")
+        # ---- Step D: Call the planning agent ----
+        plan_json = call_planning_agent(plan_data)
+        expand_plan(plan_json, merged_titles)
+
+    # ---- Step E: Attach LLM usage / cost summary ----
+    plan_json["usage"] = summarize_calls(llm_calls)
+    log_debug(
+        f"LLM usage: {plan_json['usage']['calls']} calls, "
+        f"{plan_json['usage']['prompt_tokens']} prompt / "
+        f"{plan_json['usage']['candidate_tokens']} response tokens, "
+        f"${plan_json['usage']['cost_usd']:.6f}"
+    )
 
-    log_debug("Calling planning agent...")
-    # ---- Step D: Call the planning agent ----
-    plan_json = call_planning_agent(plan_data)
+    # Keep the scored list so a later re-plan doesn't parse or score again.
+    remember_plan(
+        plan_json, scored, energy_level, merged_titles, plan_data["suggested_shortlist"]
+    )
 
-    # ---- Step E: Pretty-print output ----
+    # ---- Step F: Pretty-print output ----
     log_debug("Final plan generated:")
-    print_final_plan(plan_json)
+    if print_plan:
+        print_final_plan(plan_json)
 
     return plan_json
 
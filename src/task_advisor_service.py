@@ -0,0 +1,466 @@
+"""
+Task Advisor Service
+
+Long-running local service mode. Instead of paying interpreter start-up,
+SDK import, .env loading and client construction on every
+`python src/task_advisor.py` run, start one process and send it requests:
+
+    python src/task_advisor_service.py --port 8080
+    python src/task_advisor_service.py --unix /tmp/task_advisor.sock
+
+Endpoints (plain HTTP/1.1, JSON bodies, one request per connection):
+- POST /advise   body: {"raw_tasks_str" | "tasks", "available_minutes", "energy_level",
+                 "dedupe"}; returns the plan JSON from run_task_advisor
+                 ("dedupe" defaults to the --dedupe flag)
+- POST /replan   body: {"plan_id", "completed_titles", "skipped_titles",
+                 "available_minutes", "energy_level"}; returns the plan JSON
+                 from replan_task_advisor (LLM only on material changes),
+                 404 if plan_id is unknown or has been evicted
+- GET  /health   200 {"status": "ok"} while serving, 503 while draining
+- GET  /metrics  request counters, in-flight count and latency stats (per
+                 endpoint: advise_* and replan_*), plus
+                 per-stage LLM token / latency / cost totals ("llm");
+                 add ?format=prometheus for Prometheus text output
+
+The google-genai clients are created once at start-up and kept warm, and
+parse requests from concurrent users share a ParseBatcher. Each request is
+driven by a thread in a thread pool (the LLM calls are I/O-bound and share
+the warm clients). With --cpu-workers N, large deduplicated requests (see
+task_advisor.DETERMINISTIC_POOL_MIN_TASKS) run their deterministic stages in
+a process pool instead, so a multi-second dedupe doesn't hold the GIL for
+everyone else; smaller requests are cheaper inline, which is the default.
+Invalid request bodies are rejected with 400 before any work.
+On SIGINT/SIGTERM the service stops accepting work, waits for in-flight
+requests to finish (up to drain_timeout_s) and then exits.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+try:
+    from task_advisor import run_task_advisor
+    from replan import PLAN_STORE, replan_task_advisor
+    from parse_batcher import ParseBatcher
+    from llm_metrics import REGISTRY
+    from task_codec import validate_tasks
+    import main as planner
+    import parse_tasks_agent
+    import plan_explainer_agent
+except ImportError:
+    from src.task_advisor import run_task_advisor
+    from src.replan import PLAN_STORE, replan_task_advisor
+    from src.parse_batcher import ParseBatcher
+    from src.llm_metrics import REGISTRY
+    from src.task_codec import validate_tasks
+    from src import main as planner
+    from src import parse_tasks_agent
+    from src import plan_explainer_agent
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = 8
+DEFAULT_CPU_WORKERS = 0
+DEFAULT_DRAIN_TIMEOUT_S = 30.0
+MAX_BODY_BYTES = 1024 * 1024
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    """An error that maps directly onto an HTTP status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _require_minutes(request: dict, key: str, default=None) -> int:
+    value = request.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise HttpError(400, f"{key} must be a non-negative integer.")
+    return value
+
+
+def _require_optional_str(request: dict, key: str, default=None) -> str | None:
+    value = request.get(key, default)
+    if value is not None and not isinstance(value, str):
+        raise HttpError(400, f"{key} must be a string.")
+    return value
+
+
+def _require_bool(request: dict, key: str, default: bool) -> bool:
+    value = request.get(key, default)
+    if not isinstance(value, bool):
+        raise HttpError(400, f"{key} must be true or false.")
+    return value
+
+
+def _require_titles(request: dict, key: str) -> list[str]:
+    value = request.get(key, [])
+    if not isinstance(value, list) or not all(isinstance(t, str) for t in value):
+        raise HttpError(400, f"{key} must be a list of strings.")
+    return value
+
+
+def log_service(msg: str) -> None:
+    """Service lifecycle messages; printed with or without --debug."""
+    print(f"==== [service] {msg}")
+
+
+def _init_cpu_worker(debug: bool) -> None:
+    """Worker processes import main afresh; carry the parent's DEBUG setting over."""
+    planner.DEBUG = debug
+
+
+class ServiceMetrics:
+    """In-process counters exposed on GET /metrics, kept per endpoint."""
+
+    ENDPOINTS = ("advise", "replan")
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests_total = 0
+        self.in_flight = 0
+        self._endpoints = {
+            name: {"ok": 0, "errors": 0, "latency_sum_s": 0.0, "latency_max_s": 0.0}
+            for name in self.ENDPOINTS
+        }
+
+    def record(self, endpoint: str, latency_s: float, ok: bool) -> None:
+        e = self._endpoints[endpoint]
+        if ok:
+            e["ok"] += 1
+        else:
+            e["errors"] += 1
+        e["latency_sum_s"] += latency_s
+        e["latency_max_s"] = max(e["latency_max_s"], latency_s)
+
+    def snapshot(self, draining: bool) -> dict:
+        snapshot = {
+            "uptime_s": round(time.time() - self.started_at, 3),
+            "draining": draining,
+            "requests_total": self.requests_total,
+            "in_flight": self.in_flight,
+        }
+        for name, e in self._endpoints.items():
+            completed = e["ok"] + e["errors"]
+            snapshot[f"{name}_ok"] = e["ok"]
+            snapshot[f"{name}_errors"] = e["errors"]
+            snapshot[f"{name}_latency_avg_s"] = (
+                round(e["latency_sum_s"] / completed, 4) if completed else None
+            )
+            snapshot[f"{name}_latency_max_s"] = round(e["latency_max_s"], 4)
+        return snapshot
+
+
+class TaskAdvisorService:
+    """
+    asyncio front end around run_task_advisor.
+
+    Holds the long-lived state (worker pool, ParseBatcher, metrics) so
+    every request after the first one runs against warm clients.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        cpu_workers: int = DEFAULT_CPU_WORKERS,
+        drain_timeout_s: float = DEFAULT_DRAIN_TIMEOUT_S,
+        parse_batcher: ParseBatcher | None = None,
+        dedupe: bool = False,
+    ):
+        self.drain_timeout_s = drain_timeout_s
+        # Default for /advise requests that don't say "dedupe" themselves.
+        self.dedupe = dedupe
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="task-advisor"
+        )
+        self.cpu_workers = cpu_workers
+        # 0 keeps the deterministic stages on the request thread. Workers are
+        # spawned, not forked, so they don't inherit open client sockets
+        # (a forked copy would keep connections from ever reaching EOF).
+        self.cpu_pool = (
+            ProcessPoolExecutor(
+                max_workers=cpu_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_cpu_worker,
+                initargs=(planner.DEBUG,),
+            )
+            if cpu_workers
+            else None
+        )
+        self.parse_batcher = parse_batcher or ParseBatcher()
+        self.metrics = ServiceMetrics()
+        self.draining = False
+        self._server: asyncio.AbstractServer | None = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def warm_up(self) -> None:
+        """Build the google-genai clients (and start the worker processes) now
+        rather than on the first request."""
+        parse_tasks_agent.get_client()
+        plan_explainer_agent.get_client()
+        if self.cpu_pool is not None:
+            for future in [
+                self.cpu_pool.submit(int) for _ in range(self.cpu_workers)
+            ]:
+                future.result()
+        log_service("Clients warmed up.")
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        if unix_path:
+            self._server = await asyncio.start_unix_server(
+                self._handle_connection, path=unix_path
+            )
+            log_service(f"Listening on unix:{unix_path}")
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, host=host, port=port
+            )
+            bound = self._server.sockets[0].getsockname()
+            log_service(f"Listening on http://{bound[0]}:{bound[1]}")
+        return self._server
+
+    async def drain(self) -> None:
+        """Stop accepting connections and wait for in-flight requests."""
+        if self.draining:
+            return
+        self.draining = True
+        log_service(f"Draining ({self.metrics.in_flight} in flight)...")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.drain_timeout_s
+        if self._server is not None:
+            self._server.close()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=self.drain_timeout_s)
+        except asyncio.TimeoutError:
+            log_service(
+                f"Drain timed out with {self.metrics.in_flight} in flight."
+            )
+        # From Python 3.12.1 wait_closed() also waits for open connections,
+        # so it only gets whatever is left of the drain budget.
+        if self._server is not None:
+            try:
+                await asyncio.wait_for(
+                    self._server.wait_closed(), timeout=max(deadline - loop.time(), 0)
+                )
+            except asyncio.TimeoutError:
+                log_service("Connections still open after drain timeout.")
+        self.parse_batcher.flush()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.cpu_pool is not None:
+            self.cpu_pool.shutdown(wait=False, cancel_futures=True)
+        log_service("Drained.")
+
+    async def _handle_connection(self, reader, writer) -> None:
+        self.metrics.requests_total += 1
+        try:
+            method, path, query, body = await self._read_request(reader)
+            status, payload = await self._dispatch(method, path, query, body)
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            log_service(f"Unhandled error: {e!r}")
+            status, payload = 500, {"error": str(e)}
+
+        if isinstance(payload, str):
+            content_type = "text/plain; version=0.0.4"
+            data = payload.encode("utf-8")
+        else:
+            content_type = "application/json"
+            data = json.dumps(payload).encode("utf-8")
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("ascii")
+            + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HttpError(400, "Malformed request line.")
+        method, path, _version = parts
+
+        content_length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                try:
+                    content_length = int(value.strip())
+                except ValueError:
+                    raise HttpError(400, "Invalid Content-Length.")
+                if content_length < 0:
+                    raise HttpError(400, "Invalid Content-Length.")
+
+        if content_length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large.")
+        body = await reader.readexactly(content_length) if content_length else b""
+        path, _, query = path.partition("?")
+        return method.upper(), path, query, body
+
+    async def _dispatch(self, method, path, query, body):
+        if path == "/health":
+            if self.draining:
+                return 503, {"status": "draining"}
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            if parse_qs(query).get("format") == ["prometheus"]:
+                return 200, REGISTRY.to_prometheus()
+            return 200, {
+                **self.metrics.snapshot(self.draining),
+                "llm": REGISTRY.snapshot(),
+            }
+        if path == "/advise":
+            if method != "POST":
+                raise HttpError(405, "Use POST for /advise.")
+            if self.draining:
+                raise HttpError(503, "Service is draining.")
+            return 200, await self._advise(body)
+        if path == "/replan":
+            if method != "POST":
+                raise HttpError(405, "Use POST for /replan.")
+            if self.draining:
+                raise HttpError(503, "Service is draining.")
+            return 200, await self._replan(body)
+        raise HttpError(404, f"Unknown path: {path}")
+
+    @staticmethod
+    def _parse_body(body: bytes) -> dict:
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HttpError(400, f"Body is not valid JSON: {e}")
+        if not isinstance(request, dict):
+            raise HttpError(400, "Body must be a JSON object.")
+        return request
+
+    async def _advise(self, body: bytes) -> dict:
+        request = self._parse_body(body)
+        tasks = request.get("tasks")
+        if tasks is not None:
+            try:
+                tasks = validate_tasks(tasks)
+            except ValueError as e:
+                raise HttpError(400, f"Invalid tasks: {e}")
+        return await self._run_in_pool(
+            "advise",
+            run_task_advisor,
+            tasks=tasks,
+            raw_tasks_str=_require_optional_str(request, "raw_tasks_str"),
+            available_minutes=_require_minutes(request, "available_minutes", 60),
+            energy_level=_require_optional_str(request, "energy_level", "medium"),
+            parse_batcher=self.parse_batcher,
+            print_plan=False,
+            dedupe=_require_bool(request, "dedupe", self.dedupe),
+            deterministic_pool=self.cpu_pool,
+        )
+
+    async def _replan(self, body: bytes) -> dict:
+        request = self._parse_body(body)
+        plan_id = request.get("plan_id")
+        if not isinstance(plan_id, str):
+            raise HttpError(400, "plan_id must be a string.")
+        if plan_id not in PLAN_STORE:
+            raise HttpError(404, f"Unknown or expired plan_id: {plan_id}")
+        return await self._run_in_pool(
+            "replan",
+            replan_task_advisor,
+            plan_id,
+            completed_titles=_require_titles(request, "completed_titles"),
+            skipped_titles=_require_titles(request, "skipped_titles"),
+            available_minutes=_require_minutes(request, "available_minutes"),
+            energy_level=_require_optional_str(request, "energy_level"),
+            print_plan=False,
+        )
+
+    async def _run_in_pool(self, endpoint: str, fn, *args, **kwargs) -> dict:
+        """Run a blocking pipeline function in the worker pool, with metrics
+        recorded under endpoint ("advise" or "replan")."""
+        self.metrics.in_flight += 1
+        self._idle.clear()
+        start = time.perf_counter()
+        ok = False
+        try:
+            loop = asyncio.get_running_loop()
+            plan_json = await loop.run_in_executor(
+                self.executor, lambda: fn(*args, **kwargs)
+            )
+            ok = True
+            return plan_json
+        finally:
+            self.metrics.record(endpoint, time.perf_counter() - start, ok)
+            self.metrics.in_flight -= 1
+            if self.metrics.in_flight == 0:
+                self._idle.set()
+
+
+async def serve(args) -> None:
+    # Per-request debug dumps (prompts, parsed tasks, plans) are off unless
+    # asked for; with DEBUG off the lazy_dumps payloads are never rendered.
+    planner.DEBUG = args.debug
+    service = TaskAdvisorService(
+        workers=args.workers,
+        cpu_workers=args.cpu_workers,
+        drain_timeout_s=args.drain_timeout,
+        parse_batcher=ParseBatcher(
+            batch_window_s=args.batch_window, max_batch_size=args.batch_size
+        ),
+        dedupe=args.dedupe,
+    )
+    service.warm_up()
+    await service.start(host=args.host, port=args.port, unix_path=args.unix)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    await service.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Task Advisor as a local service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", default=None, help="Listen on a Unix socket path instead of TCP.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--cpu-workers", type=int, default=DEFAULT_CPU_WORKERS,
+                        help="Processes for the deterministic stages (0 = run them in the request thread).")
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT_S)
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Merge near-duplicate tasks unless a request sets \"dedupe\": false.")
+    parser.add_argument("--debug", action="store_true", help="Print per-request debug output.")
+    parser.add_argument("--batch-window", type=float, default=0.05, help="Parse batch window (seconds).")
+    parser.add_argument("--batch-size", type=int, default=8, help="Max parse requests per batch.")
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Task Codec
+
+One place for all task / plan JSON handling:
+- decode_tasks: model output (the Parse Tasks Agent) -> validated task dicts
+- decode_plan:  model output (the Planning Agent)    -> validated plan dict
+- encode_plan_data: compact JSON for the planning prompt
+- loads_model_json: fence-tolerant JSON parsing of raw model output
+- lazy_dumps: pretty JSON for debug logs, only rendered if actually printed
+
+Decoded tasks are rebuilt with exactly the schema fields, coerced to the
+right types, so the rest of the pipeline can index fields directly instead
+of calling dict.get.
+
+If msgspec is installed, decode_tasks parses and validates in one typed pass
+(msgspec.json.Decoder over the task schema). Responses that need defaults or
+coercion (missing or null fields, "20" for an int, out-of-range levels,
+untrimmed titles) fail that strict pass and go through the lenient path
+instead: parse, then validate_tasks over the list, which is slower than a
+bare json.loads (see bench_codec.py).
+
+If orjson is installed it is used for parsing and encoding; otherwise the
+stdlib json module is used. Output is identical either way.
+"""
+
+import json
+from operator import itemgetter
+from typing import Annotated, TypedDict
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional: single-pass typed decoding of tasks
+    msgspec = None
+
+try:
+    from main import log_debug
+except ImportError:
+    from src.main import log_debug
+
+
+class Task(TypedDict):
+    title: str
+    importance: int
+    urgency: int
+    desire: int
+    est_minutes: int
+
+
+class PlanTask(TypedDict):
+    title: str
+    reason: str
+    est_minutes: int
+    score: float | None
+
+
+class Plan(TypedDict):
+    shortlist: list[PlanTask]
+    nice_to_have: list[PlanTask]
+    summary: str
+
+
+# Defaults used when the model leaves a field out, matching what the
+# parse instruction asks it to infer.
+DEFAULT_LEVEL = 2
+DEFAULT_EST_MINUTES = 30
+
+
+if msgspec is not None:
+    _Title = Annotated[str, msgspec.Meta(min_length=1)]
+    _Level = Annotated[int, msgspec.Meta(ge=1, le=3)]
+
+    class _StrictTask(TypedDict):
+        """Task as the model should return it: nothing to default or coerce."""
+
+        title: _Title
+        importance: _Level
+        urgency: _Level
+        desire: _Level
+        est_minutes: Annotated[int, msgspec.Meta(ge=1)]
+
+    _decode_strict_tasks = msgspec.json.Decoder(list[_StrictTask]).decode
+
+
+def _strip_markdown_fences(raw_text: str) -> str:
+    """Remove accidental ``` fences around the model's JSON output."""
+    text = raw_text.strip()
+    if text.startswith("```"):
+        first_newline = text.find("\n")
+        if first_newline != -1:
+            text = text[first_newline + 1 :]
+        if text.strip().endswith("```"):
+            text = text.rsplit("```", 1)[0]
+    return text.strip()
+
+
+def _loads(text: str):
+    """Parse JSON, raising ValueError (json.JSONDecodeError) on bad input."""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError as e:
+            raise json.JSONDecodeError(str(e), text, 0) from None
+    return json.loads(text)
+
+
+def _dumps_compact(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def _int_field(item: dict, key: str, default: int, index: int, lo: int, hi: int | None) -> int:
+    value = item.get(key)
+    if value is None:
+        return default
+    # Fast path: the model almost always returns in-range ints already.
+    if type(value) is int and lo <= value and (hi is None or value <= hi):
+        return value
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Task {index}: {key!r} must be an integer, got {value!r}.")
+    if value < lo:
+        return lo
+    if hi is not None and value > hi:
+        return hi
+    return value
+
+
+def _decode_task(item, index: int) -> Task:
+    if not isinstance(item, dict):
+        raise ValueError(f"Task {index} is not a JSON object.")
+    title = item.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError(f"Task {index} has no title.")
+    return {
+        "title": title.strip(),
+        "importance": _int_field(item, "importance", DEFAULT_LEVEL, index, 1, 3),
+        "urgency": _int_field(item, "urgency", DEFAULT_LEVEL, index, 1, 3),
+        "desire": _int_field(item, "desire", DEFAULT_LEVEL, index, 1, 3),
+        "est_minutes": _int_field(item, "est_minutes", DEFAULT_EST_MINUTES, index, 1, None),
+    }
+
+
+def loads_model_json(raw_text: str):
+    """Parse a model response as JSON, tolerating ``` fences around it."""
+    return _loads(_strip_markdown_fences(raw_text))
+
+
+def validate_tasks(items) -> list[Task]:
+    """Validate an already-parsed JSON array into the internal task schema."""
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of tasks.")
+    return [_decode_task(item, i) for i, item in enumerate(items)]
+
+
+def decode_tasks(raw_text: str) -> list[Task]:
+    """
+    Parse and validate the Parse Tasks Agent's response.
+
+    Single typed pass when msgspec is available and the response is already
+    clean; otherwise (or if anything needs fixing up) parse + validate_tasks.
+    """
+    text = _strip_markdown_fences(raw_text)
+    if msgspec is not None:
+        try:
+            tasks = _decode_strict_tasks(text)
+        except msgspec.DecodeError:
+            pass  # needs defaults/coercion, or isn't JSON: lenient path decides
+        else:
+            # Titles are the one thing the schema can't check: they must
+            # already be trimmed, as validate_tasks would leave them.
+            titles = list(map(itemgetter("title"), tasks))
+            if titles == list(map(str.strip, titles)):
+                return tasks
+    return validate_tasks(_loads(text))
+
+
+def _decode_plan_task(item, section: str, index: int) -> PlanTask:
+    if not isinstance(item, dict):
+        raise ValueError(f"{section}[{index}] is not a JSON object.")
+    title = item.get("title")
+    if not isinstance(title, str) or not title:
+        raise ValueError(f"{section}[{index}] has no title.")
+    return {
+        "title": title,
+        "reason": str(item.get("reason") or ""),
+        "est_minutes": _display_number(item, "est_minutes", int, 0, section, index),
+        "score": _display_number(item, "score", float, None, section, index),
+    }
+
+
+def _display_number(item: dict, key: str, cast, default, section: str, index: int):
+    """
+    Coerce a display-only plan field, falling back to default.
+
+    A model answer like "est_minutes": "20 min" shouldn't fail the whole plan.
+    """
+    value = item.get(key)
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        log_debug(f"{section}[{index}]: non-numeric {key} {value!r}, using {default!r}.")
+        return default
+
+
+def validate_plan(obj) -> Plan:
+    """Validate an already-parsed planning response into the Plan schema."""
+    if not isinstance(obj, dict):
+        raise ValueError("Expected a JSON object for the plan.")
+    plan = {"summary": str(obj.get("summary") or "")}
+    for section in ("shortlist", "nice_to_have"):
+        items = obj.get(section) or []
+        if not isinstance(items, list):
+            raise ValueError(f"{section!r} must be a list.")
+        plan[section] = [
+            _decode_plan_task(item, section, i) for i, item in enumerate(items)
+        ]
+    return plan
+
+
+def decode_plan(raw_text: str) -> Plan:
+    """Parse and validate the Planning Agent's response in one pass."""
+    return validate_plan(loads_model_json(raw_text))
+
+
+def encode_plan_data(plan_data: dict) -> str:
+    """Compact JSON encoding of plan_data for the planning prompt."""
+    return _dumps_compact(plan_data)
+
+
+class lazy_dumps:
+    """
+    Deferred pretty-printed JSON for debug logging.
+
+    log_debug(lazy_dumps(obj)) only pays for json.dumps(indent=2) if the
+    message is actually formatted, i.e. when main.DEBUG is on (the
+    parse/plan agents' log_debug both honour it).
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, indent=2, ensure_ascii=False)
+
+    def __format__(self, spec: str) -> str:
+        return format(str(self), spec)